@@ -1,11 +1,27 @@
 # app.py
 import os
+import hashlib
 import requests
-import json
-from flask import Flask, render_template, request, jsonify
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from urllib3.exceptions import HTTPError as Urllib3HTTPError, ProtocolError, DecodeError
+import ijson
+import orjson
+import queue
+import threading
+import time
+import atexit
+from concurrent.futures import ThreadPoolExecutor
+from flask import Flask, request, jsonify, send_from_directory
+from flask.json.provider import JSONProvider
 from dotenv import load_dotenv, find_dotenv
 from flask_cors import CORS
 from flask_sqlalchemy import SQLAlchemy
+from flask_caching import Cache
+from flask_limiter import Limiter
+from flask_limiter.util import get_remote_address
+from sqlalchemy import insert, select, text
+from sqlalchemy.exc import DataError, IntegrityError
 from datetime import datetime
 
 # Use find_dotenv() to locate and load the .env file automatically
@@ -16,17 +32,66 @@ db_user = os.getenv("DB_USER")
 db_password = os.getenv("DB_PASSWORD")
 db_host = os.getenv("DB_HOST")
 db_name = os.getenv("DB_NAME")
-database_uri = f"mysql+mysqlconnector://{db_user}:{db_password}@{db_host}/{db_name}"
+# PyMySQL is pure Python, so it cooperates with gevent workers; utf8mb4 keeps emoji in captions intact
+database_uri = f"mysql+pymysql://{db_user}:{db_password}@{db_host}/{db_name}?charset=utf8mb4"
+
+# --- JSON Serialization ---
+class OrjsonProvider(JSONProvider):
+    """
+    Serializes request and response bodies with orjson instead of the standard library.
+    """
+    def dumps(self, obj, **kwargs):
+        return orjson.dumps(obj).decode()
+
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
+
+    def response(self, *args, **kwargs):
+        # orjson already produces bytes, so skip the str -> bytes round trip
+        obj = self._prepare_response_obj(args, kwargs)
+        return self._app.response_class(orjson.dumps(obj), mimetype="application/json")
 
 # Initialize the Flask application
 app = Flask(__name__)
+app.json = OrjsonProvider(app)
 CORS(app)  # Enable CORS for all routes
 
 # Configure SQLAlchemy
 app.config['SQLALCHEMY_DATABASE_URI'] = database_uri
 app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+app.config['SQLALCHEMY_ENGINE_OPTIONS'] = {
+    "pool_size": 10,
+    "max_overflow": 20,
+    "pool_timeout": 30,
+    "pool_pre_ping": True,  # Replace connections MySQL has dropped before they are used
+    "pool_recycle": 1800,  # Recycle connections before MySQL's wait_timeout closes them
+    "insertmanyvalues_page_size": 1000,  # Rows per multi-row INSERT when flushing queued posts
+    "json_serializer": lambda obj: orjson.dumps(obj).decode(),
+    "json_deserializer": orjson.loads,
+}
 db = SQLAlchemy(app)
 
+# --- Cache Configuration ---
+# Identical generation requests are served from the cache instead of calling Gemini again.
+# Point REDIS_URL at an instance using an LFU eviction policy (maxmemory-policy allkeys-lfu)
+# so hot prompt combinations stay resident; without it an in-process cache is used.
+redis_url = os.getenv("REDIS_URL")
+cache = Cache(app, config={
+    "CACHE_TYPE": "RedisCache" if redis_url else "SimpleCache",
+    "CACHE_REDIS_URL": redis_url,
+    "CACHE_DEFAULT_TIMEOUT": 600,
+})
+
+# --- Rate Limiting ---
+# Every generation triggers a paid Gemini call and a database write, so limit requests per client IP.
+# Counters live in the same Redis as the cache when REDIS_URL is set.
+limiter = Limiter(get_remote_address, app=app, storage_uri=redis_url or "memory://")
+GENERATION_RATE_LIMIT = "10/minute;200/day"  # Shared by /generate and /generate_batch
+
+@app.errorhandler(429)
+def rate_limit_exceeded(e):
+    return jsonify({"error": f"Rate limit exceeded: {e.description}"}), 429
+
 # --- Database Model Definition ---
 class Post(db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -36,29 +101,397 @@ class Post(db.Model):
     platform = db.Column(db.String(50), nullable=False)
     caption = db.Column(db.Text, nullable=False)
     image_prompt = db.Column(db.Text, nullable=False)
-    hashtags = db.Column(db.Text, nullable=False)
+    hashtags = db.Column(db.JSON, nullable=False)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
 
     def __repr__(self):
         return f'<Post {self.id}: {self.topic}>'
 
+# --- Write-Behind Queue for New Posts ---
+# Posts are buffered and inserted in batches by a background thread rather than
+# committed one by one on the request path, so /generate never waits on the database.
+POST_BATCH_SIZE = 1000
+POST_FLUSH_INTERVAL = 0.5  # Seconds to wait for more rows before flushing a batch
+# Batches that fail to insert are appended here as JSON lines instead of being dropped
+POST_DEAD_LETTER_PATH = os.getenv("POST_DEAD_LETTER_PATH", "failed_posts.jsonl")
+
+post_queue = queue.Queue()
+_post_writer = None
+_post_writer_lock = threading.Lock()
+_dead_letter_lock = threading.Lock()
+
+def _flush_posts(rows):
+    """
+    Inserts a batch of post rows in a single transaction.
+    """
+    with app.app_context():
+        with db.engine.begin() as conn:
+            conn.execute(insert(Post), rows)
+
+def _dead_letter_posts(rows):
+    """
+    Appends posts that could not be saved to the dead-letter file for later replay.
+    Returns False if the file could not be written either.
+    """
+    try:
+        with _dead_letter_lock, open(POST_DEAD_LETTER_PATH, "ab") as f:
+            for row in rows:
+                f.write(orjson.dumps(row) + b"\n")
+        return True
+    except Exception as e:
+        print(f"Dead-letter write error, {len(rows)} post(s) lost: {e}")
+        return False
+
+def _write_posts(rows):
+    """
+    Saves a batch of posts. If the database rejects a row, the rows are retried one by one
+    so only the rows that still fail are diverted to the dead-letter file. Any other failure,
+    such as the database being unreachable, dead-letters the whole batch at once rather than
+    waiting out a connection attempt per row.
+    """
+    try:
+        _flush_posts(rows)
+        print(f"✅ Successfully saved {len(rows)} post(s) to the database.")
+        return
+    except (IntegrityError, DataError) as e:
+        print(f"Database write error: {e}")
+        failed_rows = []
+        for i, row in enumerate(rows):
+            try:
+                _flush_posts([row])
+            except (IntegrityError, DataError) as e:
+                print(f"Database write error: {e}")
+                failed_rows.append(row)
+            except Exception as e:
+                print(f"Database write error: {e}")
+                failed_rows.extend(rows[i:])
+                break
+    except Exception as e:
+        print(f"Database write error: {e}")
+        failed_rows = rows
+
+    saved = len(rows) - len(failed_rows)
+    if saved:
+        print(f"✅ Successfully saved {saved} post(s) to the database.")
+    if failed_rows and _dead_letter_posts(failed_rows):
+        print(f"Wrote {len(failed_rows)} unsaved post(s) to {POST_DEAD_LETTER_PATH}")
+
+def _drain_post_queue():
+    """
+    Background loop that collects queued posts into batches and writes them.
+    """
+    while True:
+        rows = [post_queue.get()]
+        deadline = time.monotonic() + POST_FLUSH_INTERVAL
+        while len(rows) < POST_BATCH_SIZE:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                rows.append(post_queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+
+        # Never let one batch stop the writer, or every later post would sit in the queue
+        try:
+            _write_posts(rows)
+        except Exception as e:
+            print(f"Post writer error, {len(rows)} post(s) not saved: {e}")
+
+def enqueue_post(row):
+    """
+    Queues a post row for insertion, starting the writer thread on first use.
+    """
+    global _post_writer
+    if _post_writer is None:
+        with _post_writer_lock:
+            if _post_writer is None:
+                _post_writer = threading.Thread(target=_drain_post_queue, name="post-writer", daemon=True)
+                _post_writer.start()
+    post_queue.put(row)
+
+@atexit.register
+def _flush_remaining_posts():
+    """
+    Writes any posts still waiting in the queue when the process exits.
+    """
+    rows = []
+    while True:
+        try:
+            rows.append(post_queue.get_nowait())
+        except queue.Empty:
+            break
+    if rows:
+        try:
+            _write_posts(rows)
+        except Exception as e:
+            print(f"Post writer error, {len(rows)} post(s) not saved: {e}")
+
+# --- Gemini API Helper ---
+# Read the key once at startup; a missing key stops the app from starting rather than
+# failing every request.
+GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
+if not GEMINI_API_KEY:
+    raise RuntimeError("GEMINI_API_KEY not found.")
+GEMINI_URL = "https://generativelanguage.googleapis.com/v1beta/models/gemini-2.5-flash-preview-05-20:generateContent"
+
+# Outbound calls are bounded so a slow upstream can't hold a worker indefinitely.
+GEMINI_TIMEOUT = (3, 30)  # (connect, read) seconds
+
+# A shared session keeps TLS connections to Gemini alive between requests
+# and retries transient upstream failures with backoff.
+# Read errors are not retried: once the request has been sent, Gemini may already be
+# generating (and billing) a response, and retrying a 30 s read timeout would multiply
+# both the cost and how long the caller is blocked.
+SESSION = requests.Session()
+# Send the key as a header so it never appears in request URLs echoed back in error messages
+SESSION.headers["x-goog-api-key"] = GEMINI_API_KEY
+SESSION.mount("https://", HTTPAdapter(
+    pool_connections=20,
+    pool_maxsize=50,
+    max_retries=Retry(
+        total=3,
+        read=0,
+        backoff_factor=0.3,
+        status_forcelist=[429, 500, 502, 503, 504],
+        allowed_methods=["POST"],
+    ),
+))
+
+# --- Gemini Circuit Breaker ---
+# After repeated upstream failures, Gemini calls are short-circuited for a while instead of
+# every request waiting out the timeout. The state lives in the cache, so all workers share
+# it when REDIS_URL is set.
+GEMINI_FAILURE_THRESHOLD = 5  # Consecutive failures that open the circuit
+GEMINI_RESET_TIMEOUT = 30  # Seconds the circuit stays open before a trial call is allowed
+GEMINI_FAILURES_KEY = "gemini:failures"
+GEMINI_CIRCUIT_OPEN_KEY = "gemini:circuit_open"
+GEMINI_TRIPPED_KEY = "gemini:tripped"
+GEMINI_TRIAL_KEY = "gemini:trial"
+# How long a trial call holds the half-open circuit; longer than a call can take
+GEMINI_TRIAL_TIMEOUT = 45
+# The tripped marker expires on its own so a lost or evicted companion key can't leave
+# the breaker half-open forever; every reopen refreshes it
+GEMINI_TRIPPED_TIMEOUT = 10 * 60
+
+class GeminiUnavailableError(Exception):
+    """
+    Raised instead of calling Gemini while the circuit breaker is open.
+    """
+
+def _is_upstream_failure(e):
+    """
+    Returns True for errors that mean Gemini itself is unhealthy rather than the request being bad.
+    """
+    if isinstance(e, GeminiUnavailableError):
+        return True
+    if isinstance(e, requests.exceptions.HTTPError) and e.response is not None:
+        return e.response.status_code == 429 or e.response.status_code >= 500
+    return isinstance(e, requests.exceptions.RequestException)
+
+def _record_gemini_failure():
+    """
+    Counts a failed Gemini call and opens the circuit once the threshold is reached.
+    """
+    failures = cache.cache.inc(GEMINI_FAILURES_KEY)
+    if failures is not None and failures >= GEMINI_FAILURE_THRESHOLD:
+        cache.set(GEMINI_CIRCUIT_OPEN_KEY, True, timeout=GEMINI_RESET_TIMEOUT)
+        cache.set(GEMINI_TRIPPED_KEY, True, timeout=GEMINI_TRIPPED_TIMEOUT)
+        # Stay one short of the threshold so a failed trial call reopens the circuit straight away
+        cache.set(GEMINI_FAILURES_KEY, GEMINI_FAILURE_THRESHOLD - 1, timeout=0)
+        cache.delete(GEMINI_TRIAL_KEY)
+        print(f"⚠️ Gemini circuit breaker opened for {GEMINI_RESET_TIMEOUT}s after {failures} consecutive failures.")
+
+def _record_gemini_success():
+    """
+    Resets the failure count after a successful Gemini call, closing the circuit if it had opened.
+    """
+    # Check both keys independently: either can be evicted from the cache without the other
+    state = cache.get_dict(GEMINI_FAILURES_KEY, GEMINI_TRIPPED_KEY)
+    if state.get(GEMINI_FAILURES_KEY):
+        cache.delete(GEMINI_FAILURES_KEY)
+    if state.get(GEMINI_TRIPPED_KEY):
+        cache.delete_many(GEMINI_TRIPPED_KEY, GEMINI_TRIAL_KEY)
+        print("✅ Gemini circuit breaker closed.")
+
+def _check_gemini_circuit():
+    """
+    Raises GeminiUnavailableError if a Gemini call shouldn't be made right now: while the
+    circuit is open, or once it has reopened for a trial (half-open) and another request
+    already holds the single trial call.
+    """
+    state = cache.get_dict(GEMINI_CIRCUIT_OPEN_KEY, GEMINI_TRIPPED_KEY)
+    if state.get(GEMINI_CIRCUIT_OPEN_KEY):
+        raise GeminiUnavailableError("The AI service is temporarily unavailable.")
+    # cache.add only succeeds for the first caller, so exactly one request makes the trial call
+    if state.get(GEMINI_TRIPPED_KEY) and not cache.add(GEMINI_TRIAL_KEY, True, timeout=GEMINI_TRIAL_TIMEOUT):
+        raise GeminiUnavailableError("The AI service is temporarily unavailable.")
+
+PROMPT_TEMPLATE = """
+You are an expert social media manager. Your task is to generate a social media post based on the provided details.
+- Persona: "{persona}"
+- Topic: "{topic}"
+- Tone: "{tone}"
+- Platform: "{platform}"
+Please provide three things:
+1.  A caption that is engaging and informative. Use Markdown for formatting.
+2.  A descriptive prompt for an AI image generator.
+3.  A list of 5-7 relevant hashtags.
+Format your response as a single, minified JSON object with three keys: "caption", "imagePrompt", and "hashtags" (an array of strings).
+"""
+
+def _call_gemini(topic, tone, platform, persona):
+    """
+    Calls the Gemini API and returns the raw response along with the parsed post content.
+    Raises GeminiUnavailableError without calling the API while the circuit breaker is open.
+    """
+    _check_gemini_circuit()
+
+    prompt = PROMPT_TEMPLATE.format_map({"persona": persona, "topic": topic, "tone": tone, "platform": platform})
+
+    payload = {"contents": [{"parts": [{"text": prompt}]}], "generationConfig": {"responseMimeType": "application/json"}}
+    try:
+        with SESSION.post(GEMINI_URL, json=payload, timeout=GEMINI_TIMEOUT, stream=True) as response:
+            response.raise_for_status()
+
+            # Pull the generated text straight out of the streamed envelope instead of
+            # buffering and decoding the whole Gemini response first
+            response.raw.decode_content = True
+            content_text = _read_generated_text(response)
+    except requests.exceptions.RequestException as e:
+        if _is_upstream_failure(e):
+            _record_gemini_failure()
+        else:
+            # Gemini answered, it just rejected this request
+            _record_gemini_success()
+        raise
+    _record_gemini_success()
+
+    if content_text is None:
+        raise ValueError("The AI returned an empty or invalid response.")
+    generated_content = orjson.loads(content_text)
+    if not _is_valid_generated_content(generated_content):
+        raise ValueError("The AI returned an empty or invalid response.")
+
+    # Only the generated text is kept; the frontend reads it from the same path
+    gemini_response = {"candidates": [{"content": {"parts": [{"text": content_text}]}}]}
+    return gemini_response, generated_content
+
+def _read_generated_text(response):
+    """
+    Reads the generated text out of a streamed Gemini response. The body is read through
+    urllib3 directly, so errors while reading it are re-raised as the requests exceptions
+    requests itself would raise, letting callers and the circuit breaker treat them alike.
+    """
+    try:
+        content_text = next(ijson.items(response.raw, "candidates.item.content.parts.item.text"), None)
+        response.raw.drain_conn()  # Read the rest so the connection can be reused
+        return content_text
+    except ProtocolError as e:
+        raise requests.exceptions.ChunkedEncodingError(e, response=response)
+    except DecodeError as e:
+        raise requests.exceptions.ContentDecodingError(e, response=response)
+    except Urllib3HTTPError as e:  # Read timeouts, SSL errors and other failures mid-body
+        raise requests.exceptions.ConnectionError(e, response=response)
+    except ijson.JSONError as e:
+        raise requests.exceptions.InvalidJSONError(e, response=response)
+
+def _is_valid_generated_content(generated_content):
+    """
+    Checks that Gemini's output has the shape the Post columns expect, so a malformed
+    response can't fail the batch insert it is queued into.
+    """
+    return (
+        isinstance(generated_content, dict)
+        and isinstance(generated_content.get('caption'), str)
+        and isinstance(generated_content.get('imagePrompt'), str)
+        and isinstance(generated_content.get('hashtags'), list)
+        and all(isinstance(tag, str) for tag in generated_content['hashtags'])
+    )
+
+def _invalid_post_field(fields):
+    """
+    Returns an error message for the first input that is not a string or is too long
+    for its Post column, or None if all of them fit. Inputs are checked up front because
+    a row the database rejects would otherwise fail the whole batch it is inserted with.
+    """
+    for name, value in fields.items():
+        if not isinstance(value, str):
+            return f"'{name}' must be a string"
+        max_length = Post.__table__.c[name].type.length
+        if len(value) > max_length:
+            return f"'{name}' must be at most {max_length} characters"
+    return None
+
+def _generation_cache_key(topic, tone, platform, persona):
+    """
+    Builds a fixed-length cache key by hashing the generation inputs.
+    """
+    # Join on NUL so values containing ordinary delimiters like '|' can't collide
+    joined = "\0".join(map(str, (persona, topic, tone, platform)))
+    prompt_key = hashlib.blake2b(joined.encode(), digest_size=16).hexdigest()
+    return f"generate:{prompt_key}"
+
+# Last successful response per prompt, kept well past the normal cache timeout so it can be
+# served while Gemini is failing
+STALE_CACHE_TIMEOUT = 24 * 60 * 60
+
+def _cache_generated_response(cache_key, gemini_response):
+    """
+    Caches a fresh response, plus a long-lived copy to fall back on during Gemini outages.
+    """
+    cache.set(cache_key, gemini_response)
+    cache.set(f"stale:{cache_key}", gemini_response, timeout=STALE_CACHE_TIMEOUT)
+
+def _stale_response(cache_key, error):
+    """
+    Returns the last successful response for a prompt if the error came from Gemini being unhealthy.
+    """
+    if not _is_upstream_failure(error):
+        return None
+    return cache.get(f"stale:{cache_key}")
+
+def _save_generated_post(topic, tone, platform, persona, generated_content):
+    """
+    Queues a generated post to be saved to the database and returns the queued row.
+    """
+    row = {
+        "topic": topic,
+        "persona": persona,
+        "tone": tone,
+        "platform": platform,
+        "caption": generated_content['caption'],
+        "image_prompt": generated_content['imagePrompt'],
+        "hashtags": generated_content['hashtags'],
+        "created_at": datetime.utcnow(),
+    }
+    enqueue_post(row)
+    return row
+
+# Gemini calls for a batch run concurrently, sized to match the session's connection pool.
+MAX_BATCH_COMBINATIONS = 10
+gemini_executor = ThreadPoolExecutor(max_workers=50, thread_name_prefix="gemini")
+
 # --- Main Route to Serve the Frontend ---
 @app.route('/')
 def index():
     """
-    This function renders the main HTML page when a user visits the root URL.
+    This function serves the main HTML page when a user visits the root URL.
+    The page has no template variables, so it is sent as a static file with an
+    ETag and a Cache-Control max-age instead of being re-rendered on every hit.
     """
-    return render_template('index.html')
+    return send_from_directory(app.template_folder, 'index.html', max_age=3600)
 
 # --- API Route to Generate and Save Social Media Post ---
 @app.route('/generate', methods=['POST'])
+@limiter.shared_limit(GENERATION_RATE_LIMIT, scope="generate")
 def generate_post():
     """
     Handles content generation and saves the result to the database.
     """
     try:
         # 1. Get data from the incoming JSON request
-        data = request.json
+        data = request.get_json(silent=True) or {}
         topic = data.get('topic')
         tone = data.get('tone')
         platform = data.get('platform')
@@ -66,87 +499,174 @@ def generate_post():
 
         if not all([topic, tone, platform, persona]):
             return jsonify({"error": "Missing required fields"}), 400
+        field_error = _invalid_post_field({"topic": topic, "tone": tone, "platform": platform, "persona": persona})
+        if field_error:
+            return jsonify({"error": field_error}), 400
 
-        # 2. Get API Key and call Gemini API
-        api_key = os.getenv("GEMINI_API_KEY")
-        if not api_key:
-            return jsonify({"error": "GEMINI_API_KEY not found."}), 500
-
-        api_url = f"https://generativelanguage.googleapis.com/v1beta/models/gemini-2.5-flash-preview-05-20:generateContent?key={api_key}"
-
-        prompt = f"""
-        You are an expert social media manager. Your task is to generate a social media post based on the provided details.
-        - Persona: "{persona}"
-        - Topic: "{topic}"
-        - Tone: "{tone}"
-        - Platform: "{platform}"
-        Please provide three things:
-        1.  A caption that is engaging and informative. Use Markdown for formatting.
-        2.  A descriptive prompt for an AI image generator.
-        3.  A list of 5-7 relevant hashtags.
-        Format your response as a single, minified JSON object with three keys: "caption", "imagePrompt", and "hashtags" (an array of strings).
-        """
-
-        payload = {"contents": [{"parts": [{"text": prompt}]}], "generationConfig": {"responseMimeType": "application/json"}}
-        response = requests.post(api_url, json=payload)
-        response.raise_for_status()
-        
-        # Extract the generated content
-        gemini_response = response.json()
-        content_text = gemini_response['candidates'][0]['content']['parts'][0]['text']
-        generated_content = json.loads(content_text)
-
-        # 3. Save the new post to the database
-        new_post = Post(
-            topic=topic,
-            persona=persona,
-            tone=tone,
-            platform=platform,
-            caption=generated_content['caption'],
-            image_prompt=generated_content['imagePrompt'],
-            hashtags=json.dumps(generated_content['hashtags']) # Store hashtags as a JSON string
-        )
-        db.session.add(new_post)
-        db.session.commit()
-        
-        # *** NEW DEBUGGING LINE ***
-        # This will only print if the commit was successful.
-        print(f"✅ Successfully saved post with ID: {new_post.id} to the database.")
+        # 2. Serve repeated requests from the cache, otherwise call the Gemini API
+        cache_key = _generation_cache_key(topic, tone, platform, persona)
+        cached_response = cache.get(cache_key)
+        if cached_response is not None:
+            return jsonify(cached_response)
 
-        # 4. Send the successful response back to the frontend
-        return jsonify(gemini_response)
+        gemini_response, generated_content = _call_gemini(topic, tone, platform, persona)
 
-    except requests.exceptions.RequestException as e:
+        # 3. Queue the new post to be saved to the database
+        saved_post = _save_generated_post(topic, tone, platform, persona, generated_content)
+        _cache_generated_response(cache_key, gemini_response)
+
+        # 4. Send the successful response back to the frontend, including the queued post
+        # so the history view can show it before the background insert has run
+        return jsonify({
+            **gemini_response,
+            "savedPost": {key: saved_post[key] for key in ("topic", "caption", "image_prompt", "hashtags", "created_at")},
+        })
+
+    except (GeminiUnavailableError, requests.exceptions.RequestException) as e:
         print(f"API Request Error: {e}")
-        return jsonify({"error": f"Failed to connect to the AI service: {e}"}), 500
+        # Fall back to the last good response for this prompt while Gemini is failing
+        stale_response = _stale_response(cache_key, e)
+        if stale_response is not None:
+            response = jsonify(stale_response)
+            response.headers['X-Served-Stale'] = 'true'
+            return response
+        status = 503 if isinstance(e, GeminiUnavailableError) else 500
+        return jsonify({"error": f"Failed to connect to the AI service: {e}"}), status
     except Exception as e:
         print(f"An unexpected error occurred: {e}")
-        db.session.rollback() # Rollback the transaction on error
         return jsonify({"error": f"An internal server error occurred: {e}"}), 500
 
-# --- API Route to Get All Saved Posts ---
+# --- API Route to Generate Posts for Several Tones/Platforms at Once ---
+def _batch_cost():
+    """
+    Counts each requested combination against the generation rate limit.
+    """
+    combinations = (request.get_json(silent=True) or {}).get('combinations')
+    return len(combinations) if isinstance(combinations, list) and combinations else 1
+
+@app.route('/generate_batch', methods=['POST'])
+@limiter.shared_limit(GENERATION_RATE_LIMIT, scope="generate", cost=_batch_cost)
+def generate_batch():
+    """
+    Generates one post per (tone, platform) combination for the same topic and persona,
+    calling the Gemini API for all combinations concurrently.
+    """
+    # 1. Get data from the incoming JSON request
+    data = request.get_json(silent=True) or {}
+    topic = data.get('topic')
+    persona = data.get('persona')
+    combinations = data.get('combinations')
+
+    if not topic or not persona or not isinstance(combinations, list) or not combinations:
+        return jsonify({"error": "Missing required fields"}), 400
+    if len(combinations) > MAX_BATCH_COMBINATIONS:
+        return jsonify({"error": f"At most {MAX_BATCH_COMBINATIONS} combinations are allowed"}), 400
+    if not all(isinstance(c, dict) and c.get('tone') and c.get('platform') for c in combinations):
+        return jsonify({"error": "Each combination needs a tone and a platform"}), 400
+    for fields in [{"topic": topic, "persona": persona}] + [{"tone": c['tone'], "platform": c['platform']} for c in combinations]:
+        field_error = _invalid_post_field(fields)
+        if field_error:
+            return jsonify({"error": field_error}), 400
+
+    # 2. Serve cached combinations directly and submit the rest to Gemini in parallel
+    results = [None] * len(combinations)
+    pending = {}
+    for i, combination in enumerate(combinations):
+        tone, platform = combination['tone'], combination['platform']
+        cached_response = cache.get(_generation_cache_key(topic, tone, platform, persona))
+        if cached_response is not None:
+            results[i] = cached_response
+        else:
+            pending[i] = gemini_executor.submit(_call_gemini, topic, tone, platform, persona)
+
+    # 3. Collect the results, reporting failures per combination
+    served_stale = False
+    for i, future in pending.items():
+        tone, platform = combinations[i]['tone'], combinations[i]['platform']
+        cache_key = _generation_cache_key(topic, tone, platform, persona)
+        try:
+            gemini_response, generated_content = future.result()
+        except (GeminiUnavailableError, requests.exceptions.RequestException) as e:
+            print(f"API Request Error: {e}")
+            stale_response = _stale_response(cache_key, e)
+            if stale_response is not None:
+                results[i] = stale_response
+                served_stale = True
+            else:
+                results[i] = {"error": f"Failed to connect to the AI service: {e}"}
+            continue
+        except Exception as e:
+            print(f"An unexpected error occurred: {e}")
+            results[i] = {"error": f"An internal server error occurred: {e}"}
+            continue
+
+        _save_generated_post(topic, tone, platform, persona, generated_content)
+        _cache_generated_response(cache_key, gemini_response)
+        results[i] = gemini_response
+
+    response = jsonify(results)
+    if served_stale:
+        response.headers['X-Served-Stale'] = 'true'
+    return response
+
+# --- API Route to Get Saved Posts ---
+POSTS_PAGE_SIZE = 50
+MAX_POSTS_PAGE_SIZE = 100
+
 @app.route('/posts', methods=['GET'])
+@limiter.limit("60/minute")
 def get_posts():
     """
-    Retrieves all saved posts from the database.
+    Retrieves saved posts from the database, newest first.
+    Supports keyset pagination via ?limit=<n>&cursor=<id>; the cursor for the
+    next page is returned in the X-Next-Cursor header.
     """
     try:
-        posts = Post.query.order_by(Post.created_at.desc()).all()
+        limit = request.args.get('limit', POSTS_PAGE_SIZE, type=int)
+        limit = max(1, min(limit, MAX_POSTS_PAGE_SIZE))
+        cursor = request.args.get('cursor', type=int)
+
+        # Only fetch the columns the history view needs
+        query = (
+            select(Post.id, Post.topic, Post.caption, Post.image_prompt, Post.hashtags, Post.created_at)
+            .order_by(Post.id.desc())
+            .limit(limit)
+        )
+        if cursor is not None:
+            query = query.where(Post.id < cursor)
+        posts = db.session.execute(query).all()
+
         posts_list = [
             {
                 "id": post.id,
                 "topic": post.topic,
                 "caption": post.caption,
                 "image_prompt": post.image_prompt,
-                "hashtags": json.loads(post.hashtags),
+                "hashtags": post.hashtags,
                 "created_at": post.created_at.isoformat()
             } for post in posts
         ]
-        return jsonify(posts_list)
+        response = jsonify(posts_list)
+        if len(posts) == limit:
+            response.headers['X-Next-Cursor'] = str(posts[-1].id)
+        return response
     except Exception as e:
         print(f"Database query error: {e}")
         return jsonify({"error": "Failed to retrieve posts."}), 500
 
+# --- Health Check Route ---
+@app.route('/health', methods=['GET'])
+def health():
+    """
+    Verifies that a database connection can be checked out of the pool and used.
+    """
+    try:
+        db.session.execute(text("SELECT 1"))
+        return jsonify({"status": "ok"})
+    except Exception as e:
+        print(f"Health check failed: {e}")
+        return jsonify({"status": "unavailable"}), 503
+
 
 # This allows the script to be run directly
 if __name__ == '__main__':
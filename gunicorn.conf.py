@@ -0,0 +1,17 @@
+# gunicorn.conf.py
+# Production server settings, picked up automatically by: gunicorn app:app
+import os
+
+bind = os.getenv("BIND", "0.0.0.0:8000")
+workers = int(os.getenv("WEB_CONCURRENCY", "4"))
+
+# Gevent workers run each request in a greenlet, so a worker blocked on a Gemini call
+# can keep serving other requests. The worker monkey-patches the standard library
+# before loading app.py, which is why the app is not preloaded in the master process.
+worker_class = "gevent"
+worker_connections = 1000
+preload_app = False
+
+# With async workers this only restarts a worker whose event loop stops responding;
+# it does not limit how long a single request (such as a slow Gemini call) may take
+timeout = 30